@@ -0,0 +1,231 @@
+"""Admission control for the SQLite-bound API.
+
+Requests are sorted into classes (interactive reads, writes, bulk jobs), each
+with its own concurrency cap, on top of a shared cap for the whole app. When a
+slot frees up it goes to the highest-priority waiter whose class still has room,
+so front-desk reads are not stuck behind an export. Requests that wait longer
+than their class deadline get a 503 with ``Retry-After`` instead of queueing
+indefinitely behind SQLite's writer lock.
+"""
+import asyncio
+import bisect
+import itertools
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+
+READ = "read"
+WRITE = "write"
+BULK = "bulk"
+
+EXEMPT_PATHS = frozenset({"/health", "/admission", "/docs", "/redoc", "/openapi.json"})
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, request_class: str, retry_after: int):
+        super().__init__(f"{request_class} queue deadline exceeded")
+        self.request_class = request_class
+        self.retry_after = retry_after
+
+
+@dataclass
+class RequestClass:
+    name: str
+    limit: int
+    priority: int  # lower is served first
+    timeout: float  # seconds a request may wait for a slot
+    in_flight: int = 0
+    queued: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=1024))
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    request_class: RequestClass = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    def __init__(self, total_limit: int, classes: List[RequestClass]):
+        self.total_limit = total_limit
+        self.classes: Dict[str, RequestClass] = {c.name: c for c in classes}
+        self.in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            total_limit=_env_int("ADMISSION_TOTAL_LIMIT", 16),
+            classes=[
+                RequestClass(READ, _env_int("ADMISSION_READ_LIMIT", 16), 0, _env_float("ADMISSION_READ_TIMEOUT", 2.0)),
+                RequestClass(WRITE, _env_int("ADMISSION_WRITE_LIMIT", 4), 1, _env_float("ADMISSION_WRITE_TIMEOUT", 5.0)),
+                RequestClass(BULK, _env_int("ADMISSION_BULK_LIMIT", 1), 2, _env_float("ADMISSION_BULK_TIMEOUT", 30.0)),
+            ],
+        )
+
+    def _has_room(self, request_class: RequestClass) -> bool:
+        return self.in_flight < self.total_limit and request_class.in_flight < request_class.limit
+
+    def _admit(self, request_class: RequestClass, started: float) -> None:
+        self.in_flight += 1
+        request_class.in_flight += 1
+        request_class.admitted += 1
+        request_class.waits.append(time.monotonic() - started)
+
+    async def acquire(self, name: str) -> None:
+        request_class = self.classes[name]
+        started = time.monotonic()
+        # _wake() runs on every release, so any queued waiter lacks room; a
+        # newcomer that has room is not overtaking anyone it could compete with.
+        if self._has_room(request_class):
+            self._admit(request_class, started)
+            return
+
+        waiter = _Waiter(
+            request_class.priority, next(self._seq), request_class,
+            asyncio.get_running_loop().create_future(),
+        )
+        bisect.insort(self._waiters, waiter)
+        request_class.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), request_class.timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # Granted a slot at the same moment the deadline fired; give it back.
+                self.release(name)
+            request_class.rejected += 1
+            # Rejected waits are the tail under overload; leaving them out would
+            # make the percentiles look healthy exactly when they are not.
+            request_class.waits.append(time.monotonic() - started)
+            raise AdmissionRejected(name, max(1, math.ceil(request_class.timeout)))
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                self.release(name)
+            raise
+        finally:
+            request_class.queued -= 1
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # Counted here rather than in _wake(): a grant that races the deadline
+        # is handed back above and counts only as rejected.
+        request_class.admitted += 1
+        request_class.waits.append(time.monotonic() - started)
+
+    def release(self, name: str) -> None:
+        request_class = self.classes[name]
+        self.in_flight -= 1
+        request_class.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        for waiter in list(self._waiters):
+            if self.in_flight >= self.total_limit:
+                break
+            if waiter.future.done() or not self._has_room(waiter.request_class):
+                continue
+            self._waiters.remove(waiter)
+            self.in_flight += 1
+            waiter.request_class.in_flight += 1
+            waiter.future.set_result(None)
+
+    def stats(self) -> dict:
+        classes = {}
+        for c in self.classes.values():
+            waits = sorted(c.waits)
+            classes[c.name] = {
+                "limit": c.limit,
+                "in_flight": c.in_flight,
+                "queue_depth": c.queued,
+                "admitted": c.admitted,
+                "rejected": c.rejected,
+                "wait_p50_ms": _percentile_ms(waits, 0.50),
+                "wait_p99_ms": _percentile_ms(waits, 0.99),
+                "wait_max_ms": _percentile_ms(waits, 1.0),
+            }
+        return {"total_limit": self.total_limit, "in_flight": self.in_flight, "classes": classes}
+
+
+def _percentile_ms(sorted_waits: List[float], q: float) -> Optional[float]:
+    if not sorted_waits:
+        return None
+    index = min(len(sorted_waits) - 1, int(q * len(sorted_waits)))
+    return round(sorted_waits[index] * 1000, 2)
+
+
+def classify(
+    method: str, path: str, bulk_prefixes: Tuple[str, ...] = (), exempt_paths: FrozenSet[str] = EXEMPT_PATHS
+) -> Optional[str]:
+    if path in exempt_paths:
+        return None
+    if bulk_prefixes and path.startswith(bulk_prefixes):
+        return BULK
+    if method in ("GET", "HEAD"):
+        return READ
+    if method == "OPTIONS":
+        return None
+    return WRITE
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that holds a slot for the full response, including streamed bodies."""
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        bulk_prefixes: Tuple[str, ...] = (),
+        exempt_paths: FrozenSet[str] = EXEMPT_PATHS,
+    ):
+        self.app = app
+        self.controller = controller
+        self.bulk_prefixes = tuple(bulk_prefixes)
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = classify(scope["method"], scope["path"], self.bulk_prefixes, self.exempt_paths)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire(name)
+        except AdmissionRejected as exc:
+            await _send_unavailable(send, exc)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name)
+
+
+async def _send_unavailable(send, exc: AdmissionRejected) -> None:
+    body = b'{"detail":"Server busy, retry later"}'
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(exc.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,5 +1,7 @@
 from sqlmodel import Session, select
-from typing import Optional, List
+from sqlalchemy import tuple_, union
+from typing import Optional, List, Tuple
+from datetime import date, datetime, timezone
 from .models import (
     Patient, PatientCreate,
     Visit, VisitCreate,
@@ -20,6 +22,34 @@ def get_patients(session: Session, query: Optional[str] = None, skip: int = 0, l
     return session.exec(statement).all()
 
 
+def get_patients_after(session: Session, after_id: int = 0, limit: int = 500) -> List[Patient]:
+    # Keyset batch by primary key.
+    statement = select(Patient).where(Patient.id > after_id).order_by(Patient.id).limit(limit)
+    return session.exec(statement).all()
+
+
+def get_patients_by_ids(session: Session, patient_ids: List[int]) -> List[Patient]:
+    statement = select(Patient).where(Patient.id.in_(patient_ids)).order_by(Patient.id)
+    return session.exec(statement).all()
+
+
+def get_patient_ids_changed_since(session: Session, since: datetime) -> List[int]:
+    # Ids of patients that have anything (themselves, a visit or a certificate)
+    # created at or after `since`, in one pass over the created_at indexes.
+    # Edits are not tracked, so an updated patient is not picked up.
+    if since.tzinfo is not None:
+        # created_at is stored as naive UTC.
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    statement = union(
+        select(Patient.id).where(Patient.created_at >= since),
+        select(Visit.patient_id).where(Visit.created_at >= since),
+        select(Visit.patient_id)
+        .join(Certificate, Certificate.visit_id == Visit.id)
+        .where(Certificate.created_at >= since),
+    )
+    return sorted(session.exec(statement).scalars().all())
+
+
 def get_patient(session: Session, patient_id: int) -> Optional[Patient]:
     return session.get(Patient, patient_id)
 
@@ -60,6 +90,38 @@ def get_visits_by_patient(session: Session, patient_id: int) -> List[Visit]:
     return session.exec(statement).all()
 
 
+def search_visits(
+    session: Session,
+    doctor: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    after: Optional[Tuple[date, int]] = None,
+    limit: int = 50,
+) -> List[Visit]:
+    # Ordered by (date, id) so the (doctor, date) / (date) indexes drive both the
+    # range filter and the ordering; `after` is the keyset of the previous page.
+    statement = select(Visit)
+    if doctor:
+        statement = statement.where(Visit.doctor == doctor)
+    if date_from:
+        statement = statement.where(Visit.date >= date_from)
+    if date_to:
+        statement = statement.where(Visit.date <= date_to)
+    if after:
+        statement = statement.where(tuple_(Visit.date, Visit.id) > tuple_(*after))
+    statement = statement.order_by(Visit.date, Visit.id).limit(limit)
+    return session.exec(statement).all()
+
+
+def get_visits_by_patients(session: Session, patient_ids: List[int]) -> List[Visit]:
+    statement = (
+        select(Visit)
+        .where(Visit.patient_id.in_(patient_ids))
+        .order_by(Visit.patient_id, Visit.date.desc())
+    )
+    return session.exec(statement).all()
+
+
 def get_visit(session: Session, visit_id: int) -> Optional[Visit]:
     return session.get(Visit, visit_id)
 
@@ -80,6 +142,15 @@ def get_certificates_by_visit(session: Session, visit_id: int) -> List[Certifica
     return session.exec(statement).all()
 
 
+def get_certificates_by_visits(session: Session, visit_ids: List[int]) -> List[Certificate]:
+    statement = (
+        select(Certificate)
+        .where(Certificate.visit_id.in_(visit_ids))
+        .order_by(Certificate.visit_id, Certificate.created_at.desc())
+    )
+    return session.exec(statement).all()
+
+
 def get_certificate(session: Session, certificate_id: int) -> Optional[Certificate]:
     return session.get(Certificate, certificate_id)
 
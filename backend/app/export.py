@@ -0,0 +1,89 @@
+"""NDJSON export of full patient histories.
+
+Patients are read in keyset batches by id (for incremental exports, over the
+ids that changed, resolved once up front), and each batch's visits and
+certificates are loaded with one ``IN`` query per table, so memory is bounded
+by the batch size (plus the changed-id list) rather than the database size.
+Every batch uses a fresh session, which keeps the identity map small and
+avoids holding a single read transaction open for the whole export.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from .models import (
+    PatientRead, PatientReadWithVisits,
+    VisitRead, VisitReadWithCertificates,
+    CertificateRead,
+)
+from . import crud
+
+PATIENT_BATCH_SIZE = 200
+# Stay well below SQLite's bound-parameter limit when expanding IN (...).
+IN_CLAUSE_CHUNK = 500
+
+
+def _chunks(ids: List[int]) -> Iterator[List[int]]:
+    for i in range(0, len(ids), IN_CLAUSE_CHUNK):
+        yield ids[i:i + IN_CLAUSE_CHUNK]
+
+
+def iter_patient_export(
+    engine: Engine, since: Optional[datetime] = None, batch_size: int = PATIENT_BATCH_SIZE
+) -> Iterator[str]:
+    """Yield one JSON line per patient, with nested visits and certificates."""
+    changed_ids = None
+    if since:
+        # Resolved once up front: re-filtering every batch would rescan the
+        # visit and certificate tables per batch.
+        with Session(engine) as session:
+            changed_ids = crud.get_patient_ids_changed_since(session, since)
+
+    after_id = 0
+    offset = 0
+    while True:
+        with Session(engine) as session:
+            if changed_ids is None:
+                patients = crud.get_patients_after(session, after_id=after_id, limit=batch_size)
+                if not patients:
+                    return
+            else:
+                batch_ids = changed_ids[offset:offset + batch_size]
+                if not batch_ids:
+                    return
+                offset += batch_size
+                patients = crud.get_patients_by_ids(session, batch_ids)
+
+            visits_by_patient = defaultdict(list)
+            for chunk in _chunks([p.id for p in patients]):
+                for v in crud.get_visits_by_patients(session, chunk):
+                    visits_by_patient[v.patient_id].append(v)
+
+            certs_by_visit = defaultdict(list)
+            visit_ids = [v.id for visits in visits_by_patient.values() for v in visits]
+            for chunk in _chunks(visit_ids):
+                for c in crud.get_certificates_by_visits(session, chunk):
+                    certs_by_visit[c.visit_id].append(CertificateRead.model_validate(c))
+
+            lines = []
+            for p in patients:
+                record = PatientReadWithVisits(
+                    **PatientRead.model_validate(p).model_dump(),
+                    visits=[
+                        VisitReadWithCertificates(
+                            **VisitRead.model_validate(v).model_dump(),
+                            certificates=certs_by_visit[v.id],
+                        )
+                        for v in visits_by_patient[p.id]
+                    ],
+                )
+                lines.append(record.model_dump_json() + "\n")
+            if patients:
+                after_id = patients[-1].id
+
+        # Yield outside the session so no read transaction stays open while the
+        # consumer (an HTTP client or a file) is slow to drain.
+        yield from lines
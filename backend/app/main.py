@@ -1,18 +1,22 @@
 from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, SQLModel, create_engine, select
 from typing import Optional, List
 from contextlib import asynccontextmanager
-from datetime import date
+from datetime import date, datetime
 import os
 import json
 
 from .models import (
     Patient, PatientCreate, PatientRead, PatientReadWithVisits,
-    Visit, VisitCreate, VisitRead, VisitReadWithCertificates,
+    Visit, VisitCreate, VisitRead, VisitReadWithCertificates, VisitPage,
     Certificate, CertificateCreate, CertificateRead, CertificateReadFull
 )
 from . import crud
+from .admission import AdmissionController, AdmissionMiddleware, EXEMPT_PATHS
+from .maintenance import MaintenanceScheduler, prepare_database
+from .export import iter_patient_export
 
 DATABASE_URL = "sqlite:///./quickcert.db"
 engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
@@ -23,9 +27,19 @@ def get_session():
         yield session
 
 
+admission = AdmissionController.from_env()
+maintenance = MaintenanceScheduler.from_env(engine, is_busy=lambda: admission.in_flight > 0)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    prepare_database(engine)
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist, so indexes added after a
+    # database was first created have to be backfilled explicitly.
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
     auto_seed = os.getenv("AUTO_SEED", "").strip().lower() in {"1", "true", "yes", "on"}
     if auto_seed:
         with Session(engine) as session:
@@ -183,7 +197,11 @@ async def lifespan(app: FastAPI):
                 for c in certificates:
                     session.add(c)
                 session.commit()
+    maintenance_enabled = os.getenv("MAINTENANCE_ENABLED", "1").strip().lower() in {"1", "true", "yes", "on"}
+    if maintenance_enabled:
+        maintenance.start()
     yield
+    await maintenance.stop()
 
 
 app = FastAPI(
@@ -193,6 +211,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Registered before CORS so CORS stays outermost and 503s still carry CORS headers.
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    bulk_prefixes=("/export", "/maintenance"),
+    exempt_paths=EXEMPT_PATHS | {"/maintenance"},
+)
+
 cors_allow_origin_regex = os.getenv("CORS_ALLOW_ORIGIN_REGEX")
 cors_allow_origins = [
     o.strip() for o in os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:3000").split(",") if o.strip()
@@ -299,6 +325,34 @@ def create_visit(patient_id: int, visit: VisitCreate, session: Session = Depends
     return crud.create_visit(session, patient_id, visit)
 
 
+@app.get("/visits", response_model=VisitPage)
+def search_visits(
+    doctor: Optional[str] = Query(None, description="Exact doctor name"),
+    date_from: Optional[date] = Query(None, alias="from", description="First visit date (inclusive)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Last visit date (inclusive)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    session: Session = Depends(get_session)
+):
+    after = None
+    if cursor:
+        try:
+            cursor_date, cursor_id = cursor.split(":", 1)
+            after = (date.fromisoformat(cursor_date), int(cursor_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    visits = crud.search_visits(
+        session, doctor=doctor, date_from=date_from, date_to=date_to, after=after, limit=limit + 1
+    )
+    next_cursor = None
+    if len(visits) > limit:
+        visits = visits[:limit]
+        last = visits[-1]
+        next_cursor = f"{last.date.isoformat()}:{last.id}"
+    return VisitPage(items=[VisitRead.model_validate(v) for v in visits], next_cursor=next_cursor)
+
+
 @app.get("/visits/{visit_id}", response_model=VisitReadWithCertificates)
 def get_visit(visit_id: int, session: Session = Depends(get_session)):
     visit = crud.get_visit(session, visit_id)
@@ -361,6 +415,46 @@ def list_recent_certificates(limit: int = 10, session: Session = Depends(get_ses
     return crud.get_recent_certificates(session, limit=limit)
 
 
+# Export endpoints
+@app.get("/export/patients.ndjson")
+def export_patients(
+    since: Optional[datetime] = Query(
+        None,
+        description=(
+            "Only patients with a patient, visit or certificate record created at or after this time "
+            "(naive values are UTC). Edits to existing patients are not captured."
+        ),
+    )
+):
+    # The generator opens its own sessions; a Depends() session would be closed
+    # before the body finishes streaming.
+    return StreamingResponse(iter_patient_export(engine, since=since), media_type="application/x-ndjson")
+
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/admission")
+def admission_stats():
+    return admission.stats()
+
+
+@app.get("/maintenance")
+def maintenance_status():
+    return maintenance.status()
+
+
+@app.post("/maintenance/run")
+async def run_maintenance():
+    if maintenance.running:
+        raise HTTPException(status_code=409, detail="Maintenance already running")
+    return await maintenance.run(trigger="manual")
+
+
+@app.post("/maintenance/migrate")
+async def migrate_database():
+    if maintenance.running:
+        raise HTTPException(status_code=409, detail="Maintenance already running")
+    return await maintenance.migrate()
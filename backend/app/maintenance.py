@@ -0,0 +1,241 @@
+"""Background database maintenance.
+
+Runs ANALYZE, ``PRAGMA optimize``, WAL checkpoints and incremental vacuum from
+inside the app process. Scheduled runs only happen inside a configured
+low-traffic window and while no requests are in flight. Every step runs on a
+dedicated, unpooled connection with a short busy timeout, and is interrupted
+once its time budget is spent, so maintenance backs off instead of holding
+SQLite's write lock against live traffic.
+
+Incremental vacuum and WAL checkpoints need database-level settings that an
+existing file does not have; ``migrate()`` switches them on once, on request.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, List, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+VACUUM_PAGES_PER_STEP = 256
+# Number of SQLite VM instructions between deadline checks.
+PROGRESS_CHECK_INTERVAL = 1000
+
+Step = Callable[[Connection], Tuple[str, Optional[str]]]
+
+
+def _dedicated_engine(engine: Engine) -> Engine:
+    # Per-connection pragmas (busy_timeout, analysis_limit, progress handlers)
+    # must not leak into the app's pool, so maintenance never borrows from it.
+    return create_engine(engine.url, poolclass=NullPool)
+
+
+def prepare_database(engine: Engine) -> None:
+    # auto_vacuum can only be switched on before the first table is created;
+    # existing databases need MaintenanceScheduler.migrate().
+    with _dedicated_engine(engine).connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+
+
+def _parse_window(value: str) -> Tuple[int, int]:
+    start, end = value.split("-", 1)
+    return int(start), int(end)
+
+
+class MaintenanceScheduler:
+    def __init__(
+        self,
+        engine: Engine,
+        interval: float,
+        window: Tuple[int, int],
+        step_budget: float,
+        is_busy: Callable[[], bool] = lambda: False,
+        poll_interval: float = 60.0,
+    ):
+        self.engine = _dedicated_engine(engine)
+        self.interval = interval
+        self.window = window
+        self.step_budget = step_budget
+        self.is_busy = is_busy
+        self.poll_interval = poll_interval
+        self.last_run: Optional[datetime] = None
+        self.history: Deque[dict] = deque(maxlen=20)
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, engine: Engine, is_busy: Callable[[], bool]) -> "MaintenanceScheduler":
+        return cls(
+            engine,
+            interval=float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24")) * 3600,
+            window=_parse_window(os.getenv("MAINTENANCE_WINDOW", "2-5")),
+            step_budget=float(os.getenv("MAINTENANCE_STEP_BUDGET_MS", "500")) / 1000,
+            is_busy=is_busy,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _in_window(self, now: datetime) -> bool:
+        start, end = self.window
+        if start <= end:
+            return start <= now.hour < end
+        return now.hour >= start or now.hour < end  # window wraps midnight
+
+    def _due(self, now: datetime) -> bool:
+        if self.last_run and (now - self.last_run).total_seconds() < self.interval:
+            return False
+        return self._in_window(now) and not self.is_busy()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self._due(datetime.now()) and not self.running:
+                try:
+                    await self.run(trigger="scheduled")
+                except Exception as exc:
+                    # Keep the scheduler alive; the failure is visible in history.
+                    self.last_run = datetime.now()
+                    self.history.append({
+                        "trigger": "scheduled",
+                        "started_at": self.last_run.isoformat(),
+                        "error": repr(exc),
+                    })
+
+    async def run(self, trigger: str = "manual") -> dict:
+        steps = [
+            ("analyze", self._analyze),
+            ("optimize", self._optimize),
+            ("wal_checkpoint", self._wal_checkpoint),
+            ("incremental_vacuum", self._incremental_vacuum),
+        ]
+        return await self._run(trigger, steps, self.step_budget)
+
+    async def migrate(self) -> dict:
+        """One-time switch to incremental auto-vacuum and WAL.
+
+        The VACUUM rewrites the whole file and holds an exclusive lock while it
+        does, so this is never scheduled; operators trigger it when the clinic
+        is closed.
+        """
+        steps = [
+            ("enable_incremental_vacuum", self._enable_incremental_vacuum),
+            ("enable_wal", self._enable_wal),
+        ]
+        return await self._run("migrate", steps, None)
+
+    async def _run(self, trigger: str, steps: List[Tuple[str, Step]], budget: Optional[float]) -> dict:
+        async with self._lock:
+            started_at = datetime.now()
+            started = time.monotonic()
+            results = await asyncio.to_thread(self._run_steps, steps, budget)
+            report = {
+                "trigger": trigger,
+                "started_at": started_at.isoformat(),
+                "duration_ms": round((time.monotonic() - started) * 1000, 2),
+                "steps": results,
+            }
+            self.last_run = started_at
+            self.history.append(report)
+            return report
+
+    def _run_steps(self, steps: List[Tuple[str, Step]], budget: Optional[float]) -> List[dict]:
+        results = []
+        for name, step in steps:
+            started = time.monotonic()
+            try:
+                with self.engine.connect() as conn:
+                    if budget is not None:
+                        conn.exec_driver_sql(f"PRAGMA busy_timeout = {int(budget * 1000)}")
+                        deadline = started + budget
+                        # Returning True aborts the running statement with "interrupted".
+                        conn.connection.driver_connection.set_progress_handler(
+                            lambda: time.monotonic() > deadline, PROGRESS_CHECK_INTERVAL
+                        )
+                    status, detail = step(conn)
+            except (OperationalError, sqlite3.OperationalError) as exc:
+                detail = str(getattr(exc, "orig", exc))
+                # "interrupted" means the budget ran out mid-statement; anything
+                # else is typically "database is locked": live traffic wins.
+                status = "timed_out" if "interrupted" in detail else "skipped"
+            except Exception as exc:
+                status, detail = "failed", repr(exc)
+            results.append({
+                "task": name,
+                "status": status,
+                "duration_ms": round((time.monotonic() - started) * 1000, 2),
+                "detail": detail,
+            })
+        return results
+
+    def _analyze(self, conn: Connection) -> Tuple[str, Optional[str]]:
+        # analysis_limit makes ANALYZE sample each index instead of reading it in full.
+        conn.exec_driver_sql("PRAGMA analysis_limit = 1000")
+        conn.exec_driver_sql("ANALYZE")
+        return "ok", None
+
+    def _optimize(self, conn: Connection) -> Tuple[str, Optional[str]]:
+        conn.exec_driver_sql("PRAGMA optimize")
+        return "ok", None
+
+    def _wal_checkpoint(self, conn: Connection) -> Tuple[str, Optional[str]]:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        if mode != "wal":
+            return "skipped", f"journal_mode is {mode}; run POST /maintenance/migrate"
+        # PASSIVE never waits on readers or writers; it copies what it can.
+        busy, log, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+        return "ok", f"{checkpointed}/{log} frames checkpointed" + (" (busy)" if busy else "")
+
+    def _incremental_vacuum(self, conn: Connection) -> Tuple[str, Optional[str]]:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return "skipped", "auto_vacuum is not INCREMENTAL; run POST /maintenance/migrate"
+        # sqlite3's execute() steps a statement only once, which frees a single
+        # page; executescript() steps it to completion.
+        dbapi_conn = conn.connection.driver_connection
+        initial = remaining = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        # Small chunks, each its own transaction, so the write lock is released
+        # in between; the progress handler stops the loop at the deadline.
+        while remaining:
+            dbapi_conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})")
+            remaining = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        return "ok", f"{initial - remaining} pages freed"
+
+    def _enable_incremental_vacuum(self, conn: Connection) -> Tuple[str, Optional[str]]:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return "skipped", "auto_vacuum is already INCREMENTAL"
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        # The new mode only takes effect once VACUUM rebuilds the file.
+        conn.exec_driver_sql("VACUUM")
+        return "ok", None
+
+    def _enable_wal(self, conn: Connection) -> Tuple[str, Optional[str]]:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode = WAL").scalar()
+        return ("ok", None) if mode == "wal" else ("failed", f"journal_mode is {mode}")
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_hours": self.interval / 3600,
+            "window": f"{self.window[0]}-{self.window[1]}",
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "history": list(self.history),
+        }
@@ -1,5 +1,6 @@
 from datetime import datetime, date
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 
@@ -12,6 +13,10 @@ class PatientBase(SQLModel):
 
 
 class Patient(PatientBase, table=True):
+    __table_args__ = (
+        Index("ix_patient_created_at", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     visits: List["Visit"] = Relationship(back_populates="patient")
@@ -38,6 +43,13 @@ class VisitBase(SQLModel):
 
 
 class Visit(VisitBase, table=True):
+    __table_args__ = (
+        Index("ix_visit_doctor_date", "doctor", "date"),
+        Index("ix_visit_date", "date"),
+        Index("ix_visit_patient_id_date", "patient_id", "date"),
+        Index("ix_visit_created_at", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="patient.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -59,12 +71,22 @@ class VisitReadWithCertificates(VisitRead):
     certificates: List["CertificateRead"] = []
 
 
+class VisitPage(SQLModel):
+    items: List[VisitRead] = []
+    next_cursor: Optional[str] = None  # "<date>:<id>" of the last item, None on the final page
+
+
 class CertificateBase(SQLModel):
     cert_type: str  # "medical_leave", "lab_request", "result_summary"
     cert_data: str  # JSON string
 
 
 class Certificate(CertificateBase, table=True):
+    __table_args__ = (
+        Index("ix_certificate_visit_id_created_at", "visit_id", "created_at"),
+        Index("ix_certificate_created_at", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     visit_id: int = Field(foreign_key="visit.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,34 @@
+"""Export every patient with their visits and certificates as NDJSON."""
+import argparse
+import sys
+from datetime import datetime
+from sqlmodel import create_engine
+from app.export import iter_patient_export
+
+DATABASE_URL = "sqlite:///./quickcert.db"
+engine = create_engine(DATABASE_URL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-o", "--output", help="File to write to (default: stdout)")
+    parser.add_argument(
+        "--since", type=datetime.fromisoformat,
+        help=(
+            "Only patients with records created at or after this ISO timestamp "
+            "(naive values are UTC; edits to existing patients are not captured)"
+        )
+    )
+    args = parser.parse_args()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for line in iter_patient_export(engine, since=args.since):
+            out.write(line)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,14 @@ import json
 from datetime import date, datetime
 from sqlmodel import Session, SQLModel, create_engine
 from app.models import Patient, Visit, Certificate
+from app.maintenance import prepare_database
 
 DATABASE_URL = "sqlite:///./quickcert.db"
 engine = create_engine(DATABASE_URL, echo=True)
 
 
 def create_db_and_tables():
+    prepare_database(engine)
     SQLModel.metadata.create_all(engine)
 
 
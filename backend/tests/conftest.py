@@ -0,0 +1,63 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import Patient, Visit, Certificate
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def seeded(session):
+    patients = [
+        Patient(first_name="Maria", last_name="Santos", dob=date(1985, 3, 15)),
+        Patient(first_name="Juan", last_name="Dela Cruz", dob=date(1990, 7, 22)),
+    ]
+    session.add_all(patients)
+    session.commit()
+    visits = [
+        Visit(patient_id=patients[i % 2].id, date=date(2024, 1, 1 + i), doctor=doctor, reason="Checkup")
+        for i, doctor in enumerate(["Dr. Lim", "Dr. Cruz", "Dr. Lim", "Dr. Lim", "Dr. Cruz", "Dr. Lim"])
+    ]
+    session.add_all(visits)
+    session.commit()
+    session.add(Certificate(visit_id=visits[0].id, cert_type="medical_leave", cert_data="{}"))
+    session.commit()
+    return patients, visits
+
+
+@pytest.fixture
+def query_plan(engine):
+    """Run ``fn`` and return the EXPLAIN QUERY PLAN details of the last statement it executed."""
+    return lambda fn: _query_plan(engine, fn)
+
+
+def _query_plan(engine, fn):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    statement, parameters = executed[-1]
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    return " | ".join(row[-1] for row in rows)
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import admission as admission_module
+from app.admission import (
+    AdmissionController, AdmissionMiddleware, AdmissionRejected, RequestClass, BULK, READ, WRITE,
+)
+
+
+def make_controller(total=1, read_timeout=1.0, bulk_timeout=1.0):
+    return AdmissionController(total, [
+        RequestClass(READ, total, 0, read_timeout),
+        RequestClass(WRITE, total, 1, 1.0),
+        RequestClass(BULK, total, 2, bulk_timeout),
+    ])
+
+
+def test_queued_read_is_admitted_before_queued_bulk():
+    async def scenario():
+        controller = make_controller()
+        await controller.acquire(WRITE)
+        order = []
+
+        async def request(name):
+            await controller.acquire(name)
+            order.append(name)
+            controller.release(name)
+
+        # Bulk queues first, so only priority can put the read ahead of it.
+        bulk = asyncio.create_task(request(BULK))
+        await asyncio.sleep(0)
+        read = asyncio.create_task(request(READ))
+        await asyncio.sleep(0)
+        controller.release(WRITE)
+        await asyncio.gather(bulk, read)
+        return order, controller
+
+    order, controller = asyncio.run(scenario())
+    assert order == [READ, BULK]
+    assert controller.in_flight == 0
+    assert controller.classes[READ].admitted == controller.classes[BULK].admitted == 1
+
+
+def test_request_past_deadline_is_rejected_with_retry_after():
+    async def scenario():
+        controller = make_controller(read_timeout=0.05)
+        await controller.acquire(WRITE)
+        with pytest.raises(AdmissionRejected) as exc:
+            await controller.acquire(READ)
+        return exc.value, controller
+
+    exc, controller = asyncio.run(scenario())
+    assert exc.request_class == READ
+    assert exc.retry_after == 1
+    stats = controller.stats()["classes"][READ]
+    assert stats["rejected"] == 1
+    assert stats["queue_depth"] == 0
+    # The rejected wait shows up in the tail latency.
+    assert stats["wait_max_ms"] >= 50
+
+
+def test_grant_racing_timeout_gives_slot_back(monkeypatch):
+    controller = make_controller()
+
+    async def grant_then_time_out(aw, timeout):
+        # The holder releases, which grants the queued waiter, and the deadline
+        # fires before the waiter gets to run.
+        controller.release(WRITE)
+        aw.cancel()
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        await controller.acquire(WRITE)
+        monkeypatch.setattr(admission_module.asyncio, "wait_for", grant_then_time_out)
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(READ)
+
+    asyncio.run(scenario())
+    assert controller.in_flight == 0
+    assert all(c.in_flight == 0 for c in controller.classes.values())
+    read = controller.stats()["classes"][READ]
+    assert (read["admitted"], read["rejected"]) == (0, 1)
+
+
+def test_middleware_returns_503_with_retry_after():
+    controller = AdmissionController(4, [
+        RequestClass(READ, 4, 0, 1.0),
+        RequestClass(WRITE, 0, 1, 0.01),
+        RequestClass(BULK, 1, 2, 1.0),
+    ])
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    @app.post("/things")
+    def create_thing():
+        return {"ok": True}
+
+    @app.get("/things")
+    def list_things():
+        return []
+
+    client = TestClient(app)
+    response = client.post("/things")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/things").status_code == 200
+    assert controller.in_flight == 0
@@ -0,0 +1,40 @@
+import json
+from datetime import timedelta, timezone
+
+from app import crud
+from app.export import iter_patient_export
+
+
+def test_export_nests_visits_and_certificates(engine, seeded):
+    lines = [json.loads(line) for line in iter_patient_export(engine, batch_size=1)]
+    assert [p["id"] for p in lines] == [1, 2]
+    visits = lines[0]["visits"]
+    assert len(visits) == 3
+    assert sum(len(v["certificates"]) for v in visits) == 1
+
+
+def test_incremental_export_batches_over_changed_ids(engine, seeded):
+    since = seeded[0][0].created_at - timedelta(minutes=1)
+    lines = [json.loads(line) for line in iter_patient_export(engine, since=since, batch_size=1)]
+    assert [p["id"] for p in lines] == [1, 2]
+    later = seeded[1][-1].created_at + timedelta(hours=1)
+    assert list(iter_patient_export(engine, since=later)) == []
+
+
+def test_since_with_offset_is_compared_in_utc(session, seeded):
+    created = seeded[0][0].created_at  # naive UTC
+    plus_eight = timezone(timedelta(hours=8))
+    since = (created - timedelta(minutes=1)).replace(tzinfo=timezone.utc).astimezone(plus_eight)
+    assert crud.get_patient_ids_changed_since(session, since) == [1, 2]
+    later = (created + timedelta(hours=1)).replace(tzinfo=timezone.utc).astimezone(plus_eight)
+    assert crud.get_patient_ids_changed_since(session, later) == []
+
+
+def test_changed_ids_use_created_at_indexes(query_plan, session, seeded):
+    since = seeded[0][0].created_at
+    plan = query_plan(lambda: crud.get_patient_ids_changed_since(session, since))
+    assert "INDEX ix_patient_created_at" in plan
+    assert "INDEX ix_visit_created_at" in plan
+    assert "INDEX ix_certificate_created_at" in plan
+    assert "SCAN visit" not in plan
+    assert "SCAN certificate" not in plan
@@ -0,0 +1,69 @@
+import asyncio
+import sqlite3
+
+from app.maintenance import MaintenanceScheduler
+
+
+def make_scheduler(engine, step_budget=0.5):
+    return MaintenanceScheduler(engine, interval=3600, window=(0, 24), step_budget=step_budget)
+
+
+def fill_and_delete(engine, rows=2000):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS scratch (x TEXT)")
+        conn.exec_driver_sql("INSERT INTO scratch VALUES " + ",".join(["('" + "x" * 2000 + "')"] * rows))
+        conn.exec_driver_sql("DELETE FROM scratch")
+
+
+def steps_by_task(report):
+    return {step["task"]: step for step in report["steps"]}
+
+
+def test_run_does_not_leak_pragmas_into_app_pool(engine):
+    with engine.connect() as conn:
+        before = conn.exec_driver_sql("PRAGMA busy_timeout").scalar()
+    asyncio.run(make_scheduler(engine).run())
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == before
+        assert conn.exec_driver_sql("PRAGMA analysis_limit").scalar() == 0
+
+
+def test_migrate_enables_incremental_vacuum_and_wal(engine):
+    scheduler = make_scheduler(engine)
+    migrated = steps_by_task(asyncio.run(scheduler.migrate()))
+    assert migrated["enable_incremental_vacuum"]["status"] == "ok"
+    assert migrated["enable_wal"]["status"] == "ok"
+
+    fill_and_delete(engine)
+    steps = steps_by_task(asyncio.run(scheduler.run()))
+    assert steps["wal_checkpoint"]["status"] == "ok"
+    assert steps["incremental_vacuum"]["status"] == "ok"
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA freelist_count").scalar() == 0
+
+
+def test_locked_database_is_recorded_as_skipped(engine):
+    scheduler = make_scheduler(engine, step_budget=0.05)
+    asyncio.run(scheduler.migrate())
+    fill_and_delete(engine, rows=300)
+
+    blocker = sqlite3.connect(engine.url.database)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        report = asyncio.run(scheduler.run())
+    finally:
+        blocker.rollback()
+        blocker.close()
+    vacuum = steps_by_task(report)["incremental_vacuum"]
+    assert vacuum["status"] == "skipped"
+    assert "locked" in vacuum["detail"]
+    assert scheduler.history[-1] is report
+
+
+def test_step_over_budget_is_interrupted(engine):
+    fill_and_delete(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO scratch VALUES " + ",".join(["('%d')" % i for i in range(20000)]))
+        conn.exec_driver_sql("CREATE INDEX ix_scratch_x ON scratch (x)")
+    report = asyncio.run(make_scheduler(engine, step_budget=0.0).run())
+    assert steps_by_task(report)["analyze"]["status"] == "timed_out"
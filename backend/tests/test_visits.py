@@ -0,0 +1,56 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app import crud
+from app.main import app, get_session
+from sqlmodel import Session
+
+
+def test_search_visits_by_doctor_uses_doctor_date_index(query_plan, session, seeded):
+    plan = query_plan(lambda: crud.search_visits(
+        session, doctor="Dr. Lim", date_from=date(2024, 1, 1), date_to=date(2024, 1, 31), after=(date(2024, 1, 2), 2)
+    ))
+    assert "USING INDEX ix_visit_doctor_date" in plan
+    assert "SCAN visit" not in plan
+
+
+def test_search_visits_without_doctor_uses_date_index(query_plan, session, seeded):
+    plan = query_plan(lambda: crud.search_visits(session, date_from=date(2024, 1, 1)))
+    assert "USING INDEX ix_visit_date" in plan
+    assert "SCAN visit" not in plan
+
+
+def test_visits_by_patient_uses_patient_date_index(query_plan, session, seeded):
+    plan = query_plan(lambda: crud.get_visits_by_patient(session, 1))
+    assert "USING INDEX ix_visit_patient_id_date" in plan
+
+
+def test_certificates_by_visit_uses_visit_created_at_index(query_plan, session, seeded):
+    plan = query_plan(lambda: crud.get_certificates_by_visit(session, 1))
+    assert "USING INDEX ix_certificate_visit_id_created_at" in plan
+
+
+def test_visits_keyset_pagination_round_trip(engine, seeded):
+    def override_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    try:
+        client = TestClient(app)
+        seen, cursor = [], None
+        while True:
+            params = {"doctor": "Dr. Lim", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            page = client.get("/visits", params=params).json()
+            seen.extend((v["date"], v["id"]) for v in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert len(seen) == 4
+        assert seen == sorted(seen)
+        assert client.get("/visits", params={"cursor": "bogus"}).status_code == 400
+    finally:
+        app.dependency_overrides.clear()